@@ -49,6 +49,7 @@ EOF
 
 # Set proper ownership
 chown -R pi:pi $FREEZERBOT_DIR
+chmod +x $FREEZERBOT_DIR/bin/factory-reset.sh
 
 # Create virtual environment
 echo "Setting up Python virtual environment..."
@@ -1,28 +1,75 @@
 import os
-import requests
 from dotenv import load_dotenv, set_key, unset_key
 
 API_TOKEN = 'API_TOKEN'
 API_HOST = 'FREEZERBOT_API_HOST'
 DEFAULT_HOST = 'https://api.freezerbot.com'
+# (connect, read) seconds - without a timeout a stalled connection would hang the monitor loop
+REQUEST_TIMEOUT = (5, 10)
 
-def make_api_request_with_creds(credentials, path, method='POST', json={}):
-    endpoint = f'{os.getenv(API_HOST, DEFAULT_HOST)}/api/{path}'
-    headers = {
+
+def _create_session():
+    """One session for the life of the process so readings reuse the TCP/TLS connection to the API"""
+    # Imported here so start.py and the setup checks, which only look at the token, don't load requests
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    # Only connection failures are retried, with backoff - the request never reached the API, so this is safe for
+    # POST too. Error statuses and read timeouts aren't: the API may already have stored the reading, and the monitor
+    # queues it for later when it needs sending again.
+    retries = Retry(total=3, connect=3, read=0, backoff_factor=1, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # Sent with every request, so the request helpers only add what varies
+    session.headers.update({
         'Accept': 'application/json',
         'Content-Type': 'application/json',
-    }
-    return requests.request(method, endpoint, headers=headers, json={**json, **credentials})
+    })
+    return session
+
+
+_session = None
+_auth_header_cache = (None, None)
+
+def _get_session():
+    global _session
+
+    if _session is None:
+        _session = _create_session()
+    return _session
+
+def make_api_request_with_creds(credentials, path, method='POST', json={}):
+    endpoint = f'{os.getenv(API_HOST, DEFAULT_HOST)}/api/{path}'
+    return _get_session().request(method, endpoint, json={**json, **credentials}, timeout=REQUEST_TIMEOUT)
 
 def make_api_request(path, method='POST', json={}):
     load_dotenv(override=True)
     endpoint = f"{os.getenv(API_HOST, DEFAULT_HOST)}/api/{path}"
-    headers = {
-        'Authorization': f"Bearer {os.getenv(API_TOKEN)}",
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-    }
-    return requests.request(method, endpoint, headers=headers, json=json)
+    return _get_session().request(method, endpoint, headers=_auth_headers(), json=json, timeout=REQUEST_TIMEOUT)
+
+def _auth_headers():
+    """Authorization header for the current token, rebuilt only when the token changes"""
+    global _auth_header_cache
+
+    token = os.getenv(API_TOKEN)
+    if _auth_header_cache[0] != token:
+        _auth_header_cache = (token, {'Authorization': f"Bearer {token}"})
+    return _auth_header_cache[1]
+
+def is_connection_error(error):
+    """Whether a request failed before reaching the API, so it can safely be sent again
+
+    A read timeout doesn't count - the API may already have handled the request"""
+    import requests
+    return isinstance(error, requests.exceptions.ConnectionError)
+
+def close_session():
+    """Close the pooled API connections - the session reconnects if it is used again"""
+    if _session is not None:
+        _session.close()
 
 def set_api_token(token):
     set_key('.env', API_TOKEN, token)
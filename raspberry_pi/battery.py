@@ -1,5 +1,26 @@
+import os
+import socket
+import time
 import traceback
-from pisugar import PiSugarServer, connect_tcp, test_via_tcp
+from collections import namedtuple
+from pisugar import PiSugarServer
+
+PISUGAR_HOST = "127.0.0.1"
+PISUGAR_PORT = 8423
+# pisugar-server also listens here when started with --uds, which skips the TCP stack entirely
+PISUGAR_SOCKET_FILE = "/tmp/pisugar-server.sock"
+# Don't retry a refused/dropped connection on every getter call - at most this often
+PISUGAR_RECONNECT_SECONDS = 60
+
+# Everything the monitor reports about the battery, as read by PiSugarMonitor.get_status()
+PiSugarStatus = namedtuple('PiSugarStatus', [
+    'battery_level', 'current', 'voltage', 'charging', 'power_plugged', 'charging_allowed',
+])
+# PiSugarServer getter for each PiSugarStatus field
+_STATUS_QUERIES = (
+    'get_battery_level', 'get_battery_current', 'get_battery_voltage',
+    'get_battery_charging', 'get_battery_power_plugged', 'get_battery_allow_charging',
+)
 
 
 class PiSugarMonitor:
@@ -7,60 +28,112 @@ class PiSugarMonitor:
 
     def __init__(self):
         """Initialize the PiSugar monitoring capabilities through the official library"""
+        self.server = None
+        self._conn = None
+        self._next_connect_time = 0
+        self._connect_error_logged = False
+        self._connect()
+
+    def _connect(self):
+        """Open the one command connection that every query reuses"""
         try:
-            conn, event_conn = connect_tcp()
-            self.server = PiSugarServer(conn, event_conn)
-            print("PiSugar connected via TCP")
+            if os.path.exists(PISUGAR_SOCKET_FILE):
+                self._conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self._conn.settimeout(2)
+                self._conn.connect(PISUGAR_SOCKET_FILE)
+                transport = "unix socket"
+            else:
+                self._conn = socket.create_connection((PISUGAR_HOST, PISUGAR_PORT), timeout=2)
+                # Every command is a small write followed by a read - don't let Nagle hold it back
+                self._conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                transport = "TCP"
+            # No event connection - tap events aren't used, and the library would poll it from its own thread
+            self.server = PiSugarServer(self._conn, None)
+            self._connect_error_logged = False
+            print(f"PiSugar connected via {transport}")
         except Exception as e:
-            print(f"Failed to connect to PiSugar: {traceback.format_exc()}")
-            self.server = None
+            # Only the first failure in a row gets a traceback - retries happen every minute
+            if not self._connect_error_logged:
+                print(f"Failed to connect to PiSugar: {traceback.format_exc()}")
+                self._connect_error_logged = True
+            self._disconnect()
+            self._next_connect_time = time.monotonic() + PISUGAR_RECONNECT_SECONDS
 
-    def get_battery_level(self):
-        if self.server is not None:
+    def _disconnect(self):
+        """Drop a broken connection so the next query reconnects"""
+        if self._conn is not None:
             try:
-                return self.server.get_battery_level()
-            except:
+                self._conn.close()
+            except OSError:
                 pass
+        self._conn = None
+        self.server = None
 
-    def get_current(self):
-        if self.server is not None:
+    def close(self):
+        """Close the PiSugar connection - a later query will reopen it"""
+        self._disconnect()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def _get_server(self):
+        if self.server is None and time.monotonic() >= self._next_connect_time:
+            self._connect()
+        return self.server
+
+    def _get(self, query):
+        """Run one PiSugarServer getter by name, returning None if PiSugar is unavailable or the query fails"""
+        server = self._get_server()
+        if server is not None:
             try:
-                return self.server.get_battery_current()
+                return getattr(server, query)()
             except:
-                pass
+                self._disconnect()
+
+    def get_battery_level(self):
+        return self._get('get_battery_level')
+
+    def get_current(self):
+        return self._get('get_battery_current')
 
     def get_voltage(self):
-        if self.server is not None:
-            try:
-                return self.server.get_battery_voltage()
-            except:
-                pass
+        return self._get('get_battery_voltage')
 
     def is_charging(self):
-        if self.server is not None:
-            try:
-                return self.server.get_battery_charging()
-            except:
-                pass
+        return self._get('get_battery_charging')
 
     def is_power_plugged(self):
-        if self.server is not None:
-            try:
-                return self.server.get_battery_power_plugged()
-            except:
-                pass
+        return self._get('get_battery_power_plugged')
 
     def is_charging_allowed(self):
-        if self.server is not None:
+        return self._get('get_battery_allow_charging')
+
+    def get_status(self):
+        """All battery fields in one pass over the connection - fields are None if PiSugar is unavailable"""
+        server = self._get_server()
+        values = []
+        if server is not None:
             try:
-                return self.server.get_battery_allow_charging()
+                for query in _STATUS_QUERIES:
+                    values.append(getattr(server, query)())
             except:
-                pass
+                # Don't reconnect for each remaining field - they're reported as None this time
+                self._disconnect()
+        values += [None] * (len(_STATUS_QUERIES) - len(values))
+        return PiSugarStatus(*values)
 
     # TODO add setter for battery charging range
     # https://github.com/PiSugar/pisugar-server-py/blob/main/pisugar/pisugar.py#L287
 
 # Example usage
 if __name__ == "__main__":
-    monitor = PiSugarMonitor()
-    test_via_tcp()
+    with PiSugarMonitor() as monitor:
+        print(f"Battery level: {monitor.get_battery_level()}")
+        print(f"Voltage: {monitor.get_voltage()}")
+        print(f"Current: {monitor.get_current()}")
+        print(f"Charging: {monitor.is_charging()}")
+        print(f"Power plugged: {monitor.is_power_plugged()}")
+        print(f"Charging allowed: {monitor.is_charging_allowed()}")
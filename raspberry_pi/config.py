@@ -4,6 +4,23 @@ import subprocess
 
 from api import api_token_exists
 
+# Largest request body the setup web server accepts - a setup request is a few networks and credentials
+MAX_SETUP_REQUEST_BYTES = 64 * 1024
+
+# Parsed config files keyed by path, as (st_mtime_ns, config) - several classes construct a Config at startup
+_config_cache = {}
+
+def _load_config(config_file):
+    """Parse config_file, reusing the last parse until the file is rewritten"""
+    mtime = os.stat(config_file).st_mtime_ns
+    cached = _config_cache.get(config_file)
+    if cached is None or cached[0] != mtime:
+        with open(config_file, "r") as f:
+            cached = (mtime, json.load(f))
+        _config_cache[config_file] = cached
+    # Callers modify their config in place, so each gets its own copy
+    return dict(cached[1])
+
 def clear_nm_connections():
     connections = subprocess.run(
         ["/usr/bin/nmcli", "-t", "-f", "NAME,TYPE", "connection", "show"],
@@ -17,6 +34,23 @@ def clear_nm_connections():
             subprocess.run(["/usr/bin/nmcli", "connection", "delete", conn_name],
                            stderr=subprocess.DEVNULL)
 
+# Fields of a setup request that are saved to config.json
+SETUP_CONFIG_KEYS = ('networks', 'email', 'password', 'device_name')
+
+def setup_request_error(data):
+    """Validate a setup request from the web portal, returning the error to show or None if it is valid"""
+    networks = data.get('networks')
+    if not isinstance(networks, list) or not any(
+            isinstance(network, dict) and network.get('ssid') and network.get('password') for network in networks):
+        return "At least one WiFi network with SSID and password is required"
+    if not data.get('email'):
+        return "Email is required"
+    if not data.get('password'):
+        return "Password is required"
+    if not data.get('device_name'):
+        return "Sensor name is required"
+    return None
+
 class Config:
     def __init__(self, filename='config.json'):
         self.base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -24,18 +58,28 @@ class Config:
         self.configuration_exists = os.path.exists(self.config_file)
         self.config = {}
         if self.configuration_exists:
-            with open(self.config_file, "r") as f:
-                self.config = json.load(f)
+            self.config = _load_config(self.config_file)
         self.is_configured = 'email' in self.config and 'password' in self.config or api_token_exists()
 
     def clear_config(self):
         if os.path.exists(self.config_file):
             os.remove(self.config_file)
+        _config_cache.pop(self.config_file, None)
 
     def save_new_config(self, new_config):
-        with open(self.config_file, "w") as f:
-            json.dump(new_config, f, indent=2)
+        # Serialize up front - the file is written with one write() call, and a config that can't be
+        # serialized no longer leaves it truncated
+        data = json.dumps(new_config, indent=2)
+        # Write a temp file and rename it over the old one, so a crash or power cut never leaves a half-written
+        # config for the next boot to fail on
+        temp_file = self.config_file + '.tmp'
+        with open(temp_file, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.config_file)
         self.config = new_config
+        _config_cache.pop(self.config_file, None)
 
     def save_device_name(self, new_name):
         self.config['device_name'] = new_name
@@ -1,3 +1,5 @@
+import logging
+import socket
 import subprocess
 import threading
 import time
@@ -5,18 +7,33 @@ import traceback
 from time import sleep
 
 import RPi.GPIO as GPIO
-from flask import Flask, request, render_template, redirect, jsonify
+from flask import Flask, Response, request, render_template, redirect, jsonify
+from werkzeug.serving import WSGIRequestHandler
 
-from config import Config, clear_nm_connections
+from config import Config, clear_nm_connections, setup_request_error, SETUP_CONFIG_KEYS, \
+    MAX_SETUP_REQUEST_BYTES
 from led_control import LedControl
 from restarts import restart_in_sensor_mode
 
 
+class NoDelayRequestHandler(WSGIRequestHandler):
+    """Request handler with Nagle's algorithm off - Werkzeug sends a response's headers and body as separate
+    writes, and the phone's delayed ACK of the headers would otherwise hold back the body"""
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
 class FreezerBotSetup:
     def __init__(self):
         """Initialize the FreezerBot setup application"""
         # Configuration paths
         self.config = Config()
+        # Encoded config served by /api/get-config
+        self.config_json = None
+        # Rendered page served by /
+        self.index_html = None
 
         # Initialize LED control
         self.led_control = LedControl()
@@ -26,6 +43,8 @@ class FreezerBotSetup:
                          static_url_path='',
                          static_folder='static',
                          template_folder='templates')
+        # Oversized bodies are rejected (413) before they are read into memory
+        self.app.config['MAX_CONTENT_LENGTH'] = MAX_SETUP_REQUEST_BYTES
         self.setup_routes()
 
     def setup_routes(self):
@@ -45,10 +64,16 @@ class FreezerBotSetup:
 
     def index(self):
         """Serve the main Vue application"""
-        return render_template('index.html')
+        # The page takes no context, so it is rendered once - except in debug mode, where template edits should show up
+        if self.index_html is None or self.app.debug:
+            self.index_html = render_template('index.html')
+        return self.index_html
 
     def get_current_config(self):
-        return jsonify(self.config.config)
+        # The config only changes through save_config, so it is encoded once per save rather than per request
+        if self.config_json is None:
+            self.config_json = self.app.json.dumps(self.config.config)
+        return Response(self.config_json, mimetype='application/json')
 
     def create_account(self):
         # we need to do a quick disconnect so the user can have an internet connection to create their account
@@ -76,41 +101,24 @@ class FreezerBotSetup:
 
     def save_config(self):
         """Process and save the configuration with multiple WiFi networks"""
-        try:
-            # Get JSON data
-            data = request.json
-            networks = data.get('networks', [])
-            email = data.get('email')
-            password = data.get('password')
-            device_name = data.get('device_name')
-
-            # Validate inputs
-            if not networks or not any(network.get('ssid') and network.get('password') for network in networks):
-                return jsonify({
-                    "success": False,
-                    "error": "At least one WiFi network with SSID and password is required"
-                })
-
-            if not email:
-                return jsonify({"success": False, "error": "Email is required"})
+        # Parse and validate up front - a bad request gets its error directly, without going through the
+        # exception handler below
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"success": False, "error": "Invalid JSON"}), 400
 
-            if not password:
-                return jsonify({"success": False, "error": "Password is required"})
+        error = setup_request_error(data)
+        if error:
+            return jsonify({"success": False, "error": error})
 
-            if not device_name:
-                return jsonify({'success': False, 'error': 'Sensor name is required'})
-
-            # Save configuration
-            config = {
-                "networks": networks,
-                "email": email,
-                "password": password,
-                "device_name": device_name
-            }
+        try:
+            # Save configuration - validation guarantees every field is present
+            config = {key: data[key] for key in SETUP_CONFIG_KEYS}
 
             self.config.save_new_config(config)
+            self.config_json = None
 
-            self.setup_network_manager(networks)
+            self.setup_network_manager(config['networks'])
 
             restart_thread = threading.Thread(
                 target=self.delayed_restart,
@@ -324,7 +332,7 @@ address=/#/192.168.4.1
                 self.led_control.set_state("setup")
 
                 # Start the web server only if hotspot is successfully created
-                self.app.run(host="0.0.0.0", port=80)
+                self.app.run(host="0.0.0.0", port=80, request_handler=NoDelayRequestHandler)
             except Exception as e:
                 print(f"Setup mode failed: {str(e)}")
                 self.led_control.set_state("error")
@@ -341,6 +349,8 @@ address=/#/192.168.4.1
 
 # Main entry point when run directly
 if __name__ == "__main__":
+    # Module loggers (e.g. led_control) print plain messages alongside the existing output
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     try:
         setup = FreezerBotSetup()
         setup.run()
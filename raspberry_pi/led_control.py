@@ -1,11 +1,13 @@
+import functools
+import logging
 import os
+import queue
 import subprocess
 
 import RPi.GPIO as GPIO
 import time
 import sys
 import threading
-import traceback
 
 from dotenv import load_dotenv
 
@@ -16,6 +18,37 @@ from config import Config
 LED_CONTROL_DISABLED = 'LED_DISABLED'
 BUTTON_PIN = 17
 LED_PIN = 27
+# How often the button pin is sampled when edge detection isn't available
+BUTTON_POLL_SECONDS = 0.1
+# Edges within this window after an accepted press/release are contact bounce and are ignored
+BUTTON_RELAX_SECONDS = 0.02
+# Blink frequency (Hz) of the states that are driven by a continuous PWM
+PWM_STATE_FREQUENCIES = {
+    'setup': 1,
+    'error': 5,
+}
+# (seconds held, signal method, log message) - a release after N thresholds triggers the Nth action
+BUTTON_HOLD_THRESHOLDS = [
+    (2, 'signal_reboot_preparation', "2 second press detected - preparing for reboot"),
+    (10, 'signal_reset_mode', "Long press detected (10 seconds) - preparing for reset mode"),
+    (30, 'signal_factory_reset', "Extra long press detected (30 seconds) - preparing for factory reset"),
+]
+FACTORY_RESET_SCRIPT = "/home/pi/freezerbot/bin/factory-reset.sh"
+REBOOT_COMMAND = ("/usr/bin/sudo", "/usr/sbin/reboot")
+# Full tracebacks from the button thread are logged at most this often during a fault storm
+BUTTON_ERROR_LOG_INTERVAL = 60
+
+logger = logging.getLogger(__name__)
+
+
+def _requires_led(method):
+    """Skip the decorated LedControl method when the LED is disabled or failed to set up"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self._led_ok:
+            return None
+        return method(self, *args, **kwargs)
+    return wrapper
 
 class LedControl:
     """Class for controlling the button's built-in LED with singleton pattern"""
@@ -26,6 +59,11 @@ class LedControl:
 
     def __new__(cls):
         """Ensure only one instance of LedControl exists"""
+        # Fast path once the instance exists - only the first construction needs the lock
+        instance = cls._instance
+        if instance is not None:
+            return instance
+
         with cls._lock:
             if cls._instance is None:
                 cls._instance = super(LedControl, cls).__new__(cls)
@@ -43,18 +81,45 @@ class LedControl:
         load_dotenv(override=True)
         self.module_disabled = os.getenv(LED_CONTROL_DISABLED) == 'true'
         self.led_disabled = False
+        # Single flag checked by every LED method - cleared if the module is disabled or LED setup fails
+        self._led_ok = not self.module_disabled
         self.button_disabled = False
         self.config = Config()
 
         self.BUTTON_PIN = BUTTON_PIN
         self.LED_PIN = LED_PIN
+        # Resolved up front so a broken install shows up at startup, not while someone holds the button
+        self._factory_reset_script = self._resolve_script()
+        # One long-lived worker runs patterns handed to it through the queue, instead of a new thread per pattern
         self.pattern_thread = None
+        self._pattern_queue = queue.Queue()
+        # Cooperative stop signal for the running pattern, so stopping doesn't have to clobber current_state
+        self._pattern_stop = threading.Event()
+        # Set whenever the worker has no pattern queued or running
+        self._pattern_idle = threading.Event()
+        self._pattern_idle.set()
+        self._pattern_pending = 0
+        self._pattern_lock = threading.Lock()
         self.pwm = None
+        self.pwm_frequency = None
         self.running = False
         self.current_state = None
         self.previous_state = None
         self.button_being_pressed = False
         self.button_thread = None
+        # Samples the pin instead when edge detection can't be registered
+        self.button_poll_thread = None
+        self._edge_detection = False
+        # Set from the GPIO edge callback to wake the button thread
+        self._press_event = threading.Event()
+        self._release_event = threading.Event()
+        self._press_start_time = 0
+        self._button_down = False
+        self._relax_until = 0.0
+        # The GPIO callback thread and the relax-window timer both update the button state
+        self._button_lock = threading.Lock()
+        # Set by cleanup() to wake the button thread immediately instead of waiting out its error back-off
+        self._shutdown = threading.Event()
 
         # Action trigger flags
         self.reboot_triggered = False
@@ -70,7 +135,7 @@ class LedControl:
         self.setup_led()
         self.setup_button()
 
-        print("LedControl initialized - ID: " + str(id(self)))
+        logger.info("LedControl initialized - ID: %s", id(self))
 
     def setup_led(self):
         """Set up the LED pin separately from button"""
@@ -79,15 +144,20 @@ class LedControl:
 
         try:
             GPIO.setup(self.LED_PIN, GPIO.OUT)
-            print(f"LED pin {self.LED_PIN} configured successfully")
+            logger.info("LED pin %s configured successfully", self.LED_PIN)
 
             # Test the LED by blinking once
-            GPIO.output(self.LED_PIN, GPIO.HIGH)
+            self._led(GPIO.HIGH)
             time.sleep(0.2)
-            GPIO.output(self.LED_PIN, GPIO.LOW)
-        except Exception as e:
-            print(f"LED setup failed: {traceback.format_exc()}")
+            self._led(GPIO.LOW)
+        except Exception:
+            logger.exception("LED setup failed")
             self.led_disabled = True
+            self._led_ok = False
+
+    def _led(self, value):
+        """Drive the LED pin directly - every on/off toggle goes through here"""
+        GPIO.output(self.LED_PIN, value)
 
     def setup_button(self):
         """Set up the button separately with fallback"""
@@ -96,314 +166,408 @@ class LedControl:
 
         try:
             GPIO.setup(self.BUTTON_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-
-            # Start a separate thread to poll the button state instead of using event detection
+            try:
+                # The kernel wakes us on every press/release instead of sampling the pin
+                GPIO.add_event_detect(self.BUTTON_PIN, GPIO.BOTH, callback=self.on_button_edge)
+                self._edge_detection = True
+            except Exception:
+                # e.g. "Failed to add edge detection" on some kernels - the button must keep working
+                logger.exception("Button edge detection unavailable - falling back to polling")
+                self._edge_detection = False
+
+            # Start a separate thread to time button holds
             self.running = True
+            self._shutdown.clear()
+            self._press_event.clear()
+            self._release_event.clear()
+            self._button_down = False
 
             # Make sure we don't have an existing thread running
             if self.button_thread is not None and self.button_thread.is_alive():
-                print("Button thread already running - not starting a new one")
+                logger.info("Button thread already running - not starting a new one")
                 return
 
-            self.button_thread = threading.Thread(target=self.poll_button_state)
+            self.button_thread = threading.Thread(target=self.watch_button)
             self.button_thread.daemon = True
             self.button_thread.start()
-            print(f"Button pin {self.BUTTON_PIN} configured in polling mode - Thread ID: {self.button_thread.ident}")
-        except Exception as e:
-            print(f"Button setup failed: {traceback.format_exc()}")
-            print("Button functionality will be disabled")
+
+            if self._edge_detection:
+                logger.info("Button pin %s configured with edge detection - Thread ID: %s", self.BUTTON_PIN, self.button_thread.ident)
+            else:
+                self.button_poll_thread = threading.Thread(target=self.poll_button_state)
+                self.button_poll_thread.daemon = True
+                self.button_poll_thread.start()
+                logger.info("Button pin %s configured in polling mode - Thread ID: %s", self.BUTTON_PIN, self.button_poll_thread.ident)
+        except Exception:
+            logger.exception("Button setup failed - button functionality will be disabled")
             self.button_disabled = True
 
-    def poll_button_state(self):
-        """Poll the button state instead of using event detection"""
+    def on_button_edge(self, channel):
+        """GPIO edge callback - records the press time and wakes the button thread"""
+        # React on the first edge immediately, then ignore the bounce burst that follows it
+        if time.monotonic() < self._relax_until:
+            return
+        self._update_button_state()
+
+    def _update_button_state(self):
+        """Take the button state from the pin, and re-check it once the relax window ends"""
+        with self._button_lock:
+            now = time.monotonic()
+            # Button pressed (LOW when pressed with pull-up resistor)
+            pressed = GPIO.input(self.BUTTON_PIN) == GPIO.LOW
+            if pressed == self._button_down:
+                return
+            self._button_down = pressed
+            self._relax_until = now + BUTTON_RELAX_SECONDS
+
+            if pressed:
+                self._press_start_time = now
+                self._release_event.clear()
+                self._press_event.set()
+            else:
+                self._release_event.set()
+
+        # Edges inside the relax window are dropped, so read the pin again when it ends - a glitch shorter
+        # than the window still gets its release, rather than leaving a phantom hold running
+        timer = threading.Timer(BUTTON_RELAX_SECONDS, self._update_button_state)
+        timer.daemon = True
+        timer.start()
+
+    def watch_button(self):
+        """Wait for button presses and time how long they are held"""
         thread_id = threading.get_ident()
-        print(f"Starting button polling thread - Thread ID: {thread_id}")
+        logger.info("Starting button thread - Thread ID: %s", thread_id)
 
         self.button_being_pressed = False
-        press_start_time = 0
-        two_second_mark_reached = False
-        ten_second_mark_reached = False
-        thirty_second_mark_reached = False
+        # Monotonic so an NTP step can't fake (or hide) a long press
+        now = time.monotonic
+        last_error_log_time = None
+
+        # A press that started before edge detection was armed won't produce a falling edge
+        if GPIO.input(self.BUTTON_PIN) == GPIO.LOW:
+            self.on_button_edge(self.BUTTON_PIN)
 
         while self.running and not self.button_disabled:
             try:
-                if GPIO.getmode() != GPIO.BCM:
-                    GPIO.setmode(GPIO.BCM)
-
-                current_function = GPIO.gpio_function(self.BUTTON_PIN)
-                if current_function != GPIO.IN:
-                    GPIO.setup(self.BUTTON_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-                    print(f"Button pin {self.BUTTON_PIN} reconfigured as input with pull-up")
-                    time.sleep(0.1)  # Short delay to allow hardware to stabilize
-
-                current_time = time.time()
-                current_state = GPIO.input(self.BUTTON_PIN)
-
-                # Button pressed (LOW when pressed with pull-up resistor)
-                if current_state == GPIO.LOW and not self.button_being_pressed:
-                    self.button_being_pressed = True
-                    self.set_state('off')
-                    press_start_time = time.time()
-                    two_second_mark_reached = False
-                    ten_second_mark_reached = False
-                    thirty_second_mark_reached = False
-                    self.reboot_triggered = False
-                    self.setup_mode_triggered = False
-                    self.factory_reset_triggered = False
-                    print(f"[Thread {thread_id}] Button pressed")
-
-                # Button still pressed - check for 2 second mark
-                elif current_state == GPIO.LOW and self.button_being_pressed and not two_second_mark_reached and current_time - press_start_time > 2:
-                    print(f"[Thread {thread_id}] 2 second press detected - preparing for reboot")
-                    two_second_mark_reached = True
-                    self.signal_reboot_preparation()
-
-                # Check for 10 second press while button is still pressed
-                elif current_state == GPIO.LOW and self.button_being_pressed and not ten_second_mark_reached and current_time - press_start_time > 10:
-                    print(f"[Thread {thread_id}] Long press detected (10 seconds) - preparing for reset mode")
-                    ten_second_mark_reached = True
-                    self.signal_reset_mode()
-
-                # Check for 30 second press while button is still pressed
-                elif current_state == GPIO.LOW and self.button_being_pressed and not thirty_second_mark_reached and current_time - press_start_time > 30:
-                    print(f"[Thread {thread_id}] Extra long press detected (30 seconds) - preparing for factory reset")
-                    thirty_second_mark_reached = True
-                    self.signal_factory_reset()
+                # Sleep until the edge callback (or cleanup) wakes us - no polling while idle
+                self._press_event.wait()
+                self._press_event.clear()
+                if not self.running:
+                    break
+
+                press_start_time = self._press_start_time
+                self.button_being_pressed = True
+                self.set_state('off')
+                self.reboot_triggered = False
+                self.setup_mode_triggered = False
+                self.factory_reset_triggered = False
+                logger.info("[Thread %s] Button pressed", thread_id)
+
+                # Walk the hold thresholds in order; each wait returns True as soon as the button is released
+                marks_reached = 0
+                for seconds, signal_name, message in BUTTON_HOLD_THRESHOLDS:
+                    if self._release_event.wait(max(0, press_start_time + seconds - now())) or not self.running:
+                        break
+                    logger.info("[Thread %s] %s", thread_id, message)
+                    marks_reached += 1
+                    getattr(self, signal_name)()
+                else:
+                    # Every threshold has been signalled - just wait for the release
+                    self._release_event.wait()
+
+                if not self.running:
+                    break
 
                 # Button released
-                elif current_state == GPIO.HIGH and self.button_being_pressed:
-                    self.button_being_pressed = False
-                    duration = current_time - press_start_time
-                    print(f"[Thread {thread_id}] Button released after {duration:.1f} seconds")
-
-                    if thirty_second_mark_reached and not self.factory_reset_triggered:
-                        print(f"[Thread {thread_id}] Factory resetting system...")
-                        self.factory_reset_triggered = True
-                        self.perform_factory_reset()
-                    # If we have passed the 10 second mark but not the 30 second mark, reset to setup mode
-                    elif ten_second_mark_reached and duration < 30 and not self.setup_mode_triggered:
-                        print(f"[Thread {thread_id}] Resetting to setup mode...")
-                        self.setup_mode_triggered = True
-                        # clear just the api token so we still have the current config to allow editing
-                        # the user will just have to re-enter their email/password
-                        clear_api_token()
-                        self.config.clear_creds_from_config()
-                        restart_in_setup_mode()
-                    # If we have passed the 2 second mark but not the 10 second mark, reboot
-                    elif two_second_mark_reached and duration < 10 and not self.reboot_triggered:
-                        print(f"[Thread {thread_id}] Rebooting system...")
-                        self.reboot_triggered = True
-                        self.reboot_system()
-                    elif not self.reboot_triggered and not self.setup_mode_triggered and not self.factory_reset_triggered and self.previous_state:
-                        # if the button was released without triggering anything we should set it back to the previous state
-                        self.set_state(self.previous_state)
-
-                    two_second_mark_reached = False
-                    ten_second_mark_reached = False
-                    thirty_second_mark_reached = False
-
-                # Small sleep to prevent CPU hogging
-                time.sleep(0.1)
-
-            except Exception as e:
-                print(f"[Thread {thread_id}] Error in button polling: {traceback.format_exc()}")
-                time.sleep(1)  # Longer sleep on error
-
-        print(f"[Thread {thread_id}] Button polling thread exiting")
+                self.button_being_pressed = False
+                duration = now() - press_start_time
+                logger.info("[Thread %s] Button released after %.1f seconds", thread_id, duration)
+
+                if marks_reached == 3 and not self.factory_reset_triggered:
+                    logger.info("[Thread %s] Factory resetting system...", thread_id)
+                    self.factory_reset_triggered = True
+                    self.perform_factory_reset()
+                # If we have passed the 10 second mark but not the 30 second mark, reset to setup mode
+                elif marks_reached == 2 and duration < 30 and not self.setup_mode_triggered:
+                    logger.info("[Thread %s] Resetting to setup mode...", thread_id)
+                    self.setup_mode_triggered = True
+                    # clear just the api token so we still have the current config to allow editing
+                    # the user will just have to re-enter their email/password
+                    clear_api_token()
+                    self.config.clear_creds_from_config()
+                    restart_in_setup_mode()
+                # If we have passed the 2 second mark but not the 10 second mark, reboot
+                elif marks_reached == 1 and duration < 10 and not self.reboot_triggered:
+                    logger.info("[Thread %s] Rebooting system...", thread_id)
+                    self.reboot_triggered = True
+                    self.reboot_system()
+                elif not self.reboot_triggered and not self.setup_mode_triggered and not self.factory_reset_triggered and self.previous_state:
+                    # if the button was released without triggering anything we should set it back to the previous state
+                    self.set_state(self.previous_state)
+
+            except Exception:
+                self.button_being_pressed = False
+                error_time = now()
+                if last_error_log_time is None or error_time - last_error_log_time > BUTTON_ERROR_LOG_INTERVAL:
+                    logger.exception("[Thread %s] Error handling button press", thread_id)
+                    last_error_log_time = error_time
+                self._shutdown.wait(1)  # Back off before handling the next press
+                # The pin is only reconfigured after a failure (e.g. something else ran GPIO.cleanup())
+                self.reconfigure_button_pin()
+
+        logger.info("[Thread %s] Button thread exiting", thread_id)
+
+    def poll_button_state(self):
+        """Poll the button pin when edge detection isn't available, feeding the same press/release handling"""
+        thread_id = threading.get_ident()
+        logger.info("Starting button polling thread - Thread ID: %s", thread_id)
+        last_error_log_time = None
+
+        while self.running and not self.button_disabled:
+            try:
+                self._update_button_state()
+                # Small sleep to prevent CPU hogging - cleanup() ends it early
+                self._shutdown.wait(BUTTON_POLL_SECONDS)
+            except Exception:
+                error_time = time.monotonic()
+                if last_error_log_time is None or error_time - last_error_log_time > BUTTON_ERROR_LOG_INTERVAL:
+                    logger.exception("[Thread %s] Error in button polling", thread_id)
+                    last_error_log_time = error_time
+                self._shutdown.wait(1)  # Longer sleep on error
+                # Only check the GPIO mode/pin setup after a failure, like watch_button
+                self.reconfigure_button_pin()
+
+        logger.info("[Thread %s] Button polling thread exiting", thread_id)
+
+    def reconfigure_button_pin(self):
+        """Restore BCM numbering, the button input and its edge detection after the GPIO state was reset"""
+        try:
+            if GPIO.getmode() != GPIO.BCM:
+                GPIO.setmode(GPIO.BCM)
+
+            if GPIO.gpio_function(self.BUTTON_PIN) != GPIO.IN:
+                GPIO.setup(self.BUTTON_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+                logger.info("Button pin %s reconfigured as input with pull-up", self.BUTTON_PIN)
+                time.sleep(0.1)  # Short delay to allow hardware to stabilize
+
+            # In polling mode the poll thread does the sampling - there is no edge detection to restore
+            if self._edge_detection:
+                GPIO.remove_event_detect(self.BUTTON_PIN)
+                GPIO.add_event_detect(self.BUTTON_PIN, GPIO.BOTH, callback=self.on_button_edge)
+        except Exception:
+            logger.exception("Failed to reconfigure button pin")
 
+    @_requires_led
     def set_state(self, state):
         """Set the LED to different states based on mode"""
-        if self.module_disabled or self.led_disabled or self.button_being_pressed:
+        if self.button_being_pressed:
             return
+        # The LED is already showing this state - don't restart its PWM or pattern thread. Steady states are
+        # still re-driven below: it's cheap, and repairs the pin if anything else wrote to it since
+        if state == self.current_state and state not in ('running', 'off'):
+            return
+
         # Stop any existing pattern thread
         self.stop_pattern_thread()
-        if self.pwm:
-            self.pwm.stop()
-            self.pwm = None
 
         self.previous_state = self.current_state
         # Set the current state
         self.current_state = state
 
-        if state == "setup":
-            # Blinking blue in setup mode (1 Hz)
-            self.pwm = GPIO.PWM(self.LED_PIN, 1)
-            self.pwm.start(50)  # 50% duty cycle - half on, half off
-        elif state == "running":
+        if state in PWM_STATE_FREQUENCIES:
+            # Blinking blue in setup mode (1 Hz), fast blinking in error state (5 Hz)
+            frequency = PWM_STATE_FREQUENCIES[state]
+            if self.pwm:
+                # Moving between two blinking states - retune the running PWM instead of recreating it
+                self.pwm.ChangeFrequency(frequency)
+                self.pwm.ChangeDutyCycle(50)
+            else:
+                self.pwm = GPIO.PWM(self.LED_PIN, frequency)
+                self.pwm.start(50)  # 50% duty cycle - half on, half off
+            self.pwm_frequency = frequency
+            return
+
+        self._stop_pwm()
+
+        if state == "running":
             # Solid on in normal operation
-            GPIO.output(self.LED_PIN, GPIO.HIGH)
-        elif state == "error":
-            # Fast blinking in error state (5 Hz)
-            self.pwm = GPIO.PWM(self.LED_PIN, 5)
-            self.pwm.start(50)
+            self._led(GPIO.HIGH)
         elif state == "wifi_issue":
             # Double-blink pattern for WiFi connectivity issues
             self.start_pattern_thread(self.wifi_issue_pattern)
         elif state == 'off':
-            GPIO.output(self.LED_PIN, GPIO.LOW)
+            self._led(GPIO.LOW)
 
+    @_requires_led
     def wifi_issue_pattern(self):
         """LED pattern for WiFi connectivity issues: double-blink with pause"""
-        if self.module_disabled or self.led_disabled:
-            return
-        while self.running and self.current_state == "wifi_issue":
+        # Every pause waits on the stop event, so a state change interrupts the pattern immediately.
+        # Bind the callables/constants once so the loop doesn't repeat attribute lookups every blink.
+        stopped = self._pattern_stop.wait
+        led, high, low = self._led, GPIO.HIGH, GPIO.LOW
+        while self.running and not self._pattern_stop.is_set():
             # Double blink
-            GPIO.output(self.LED_PIN, GPIO.HIGH)
-            time.sleep(0.2)
-            GPIO.output(self.LED_PIN, GPIO.LOW)
-            time.sleep(0.2)
-            GPIO.output(self.LED_PIN, GPIO.HIGH)
-            time.sleep(0.2)
-            GPIO.output(self.LED_PIN, GPIO.LOW)
+            led(high)
+            if stopped(0.2):
+                return
+            led(low)
+            if stopped(0.2):
+                return
+            led(high)
+            if stopped(0.2):
+                return
+            led(low)
 
             # Longer pause
-            time.sleep(1.0)
+            if stopped(1.0):
+                return
 
+    @_requires_led
     def signal_reboot_preparation(self):
         """Visual indication that the system is preparing to reboot (2 blinks)"""
-        if self.module_disabled or self.led_disabled:
-            return
-
-        # Stop any current patterns
-        self.stop_pattern_thread()
-
-        # Blink twice to indicate reboot preparation
-        if self.pwm:
-            self.pwm.stop()
-            self.pwm = None
-
-        for _ in range(2):
-            GPIO.output(self.LED_PIN, GPIO.HIGH)
-            time.sleep(0.1)
-            GPIO.output(self.LED_PIN, GPIO.LOW)
-            time.sleep(0.1)
+        self._blink(2, 0.1)
 
+    @_requires_led
     def signal_reset_mode(self):
         """Visual indication that the system is resetting to setup mode (5 blinks)"""
-        if self.module_disabled or self.led_disabled:
-            return
-
-        # Stop any current patterns
-        self.stop_pattern_thread()
-
-        # Blink 5 times to indicate reset to setup mode
-        if self.pwm:
-            self.pwm.stop()
-            self.pwm = None
-
-        for _ in range(5):
-            GPIO.output(self.LED_PIN, GPIO.HIGH)
-            time.sleep(0.2)
-            GPIO.output(self.LED_PIN, GPIO.LOW)
-            time.sleep(0.2)
+        self._blink(5, 0.2)
 
+    @_requires_led
     def signal_factory_reset(self):
         """Visual indication that the system is preparing for factory reset (10 rapid blinks)"""
-        if self.module_disabled or self.led_disabled:
-            return
-
-        # Stop any current patterns
-        self.stop_pattern_thread()
-
-        # Blink 10 times rapidly to indicate factory reset
-        if self.pwm:
-            self.pwm.stop()
-            self.pwm = None
-
-        for _ in range(10):
-            GPIO.output(self.LED_PIN, GPIO.HIGH)
-            time.sleep(0.05)
-            GPIO.output(self.LED_PIN, GPIO.LOW)
-            time.sleep(0.05)
+        self._blink(10, 0.05)
 
+    @_requires_led
     def signal_successful_transmission(self):
         """Visual indication that a temperature reading was successfully sent (2 fast blinks)"""
-        if self.module_disabled or self.led_disabled or self.button_being_pressed:
+        if self.button_being_pressed:
             return
 
-        # Stop any current patterns
+        # Very short on/off time (50ms)
+        self._blink(2, 0.05)
+
+    def _blink(self, times, interval):
+        """Blink the LED a fixed number of times, leaving it off afterwards"""
+        # Stop any current patterns once before taking over the pin
         self.stop_pattern_thread()
+        self._stop_pwm()
+
+        # Toggle the pin directly - a one-shot PWM's thread keeps running briefly after stop() and its last
+        # LOW write would land after the set_state that follows the blinks
+        for _ in range(times):
+            self._led(GPIO.HIGH)
+            time.sleep(interval)
+            self._led(GPIO.LOW)
+            time.sleep(interval)
+        # The blinks replaced whatever the current state was showing, so the next set_state has to redraw it
+        self.current_state = None
 
-        # Blink twice very quickly to indicate successful transmission
+    def _stop_pwm(self):
+        """Stop the blink PWM and wait out its last period before anything else drives the pin"""
         if self.pwm:
             self.pwm.stop()
             self.pwm = None
-
-        for _ in range(2):
-            GPIO.output(self.LED_PIN, GPIO.HIGH)
-            time.sleep(0.05)  # Very short on time (50ms)
-            GPIO.output(self.LED_PIN, GPIO.LOW)
-            time.sleep(0.05)  # Very short off time (50ms)
+            # RPi.GPIO's soft-PWM thread finishes the period it is in and then drives the pin LOW, which
+            # would otherwise override the level the caller sets next
+            time.sleep(1 / self.pwm_frequency)
 
     def start_pattern_thread(self, pattern_function):
-        """Start a thread to run a custom LED pattern"""
+        """Hand a custom LED pattern to the pattern worker thread"""
         if self.module_disabled:
             return
-        if self.pwm:
-            self.pwm.stop()
-            self.pwm = None
+        self._stop_pwm()
 
         self.running = True
-        self.pattern_thread = threading.Thread(target=pattern_function)
-        self.pattern_thread.daemon = True
-        self.pattern_thread.start()
+        self._pattern_stop.clear()
+        with self._pattern_lock:
+            self._pattern_pending += 1
+            self._pattern_idle.clear()
+
+        if not self.pattern_thread or not self.pattern_thread.is_alive():
+            self.pattern_thread = threading.Thread(target=self._pattern_loop)
+            self.pattern_thread.daemon = True
+            self.pattern_thread.start()
+
+        self._pattern_queue.put(pattern_function)
+
+    def _pattern_loop(self):
+        """Run queued patterns one at a time for the life of the process"""
+        while True:
+            pattern_function = self._pattern_queue.get()
+            try:
+                pattern_function()
+            except Exception:
+                logger.exception("Error in LED pattern")
+            finally:
+                with self._pattern_lock:
+                    self._pattern_pending -= 1
+                    if self._pattern_pending == 0:
+                        self._pattern_idle.set()
 
     def stop_pattern_thread(self):
-        """Stop any running pattern thread"""
-        if self.pattern_thread and self.pattern_thread.is_alive():
-            self.current_state = None
-            self.pattern_thread.join(timeout=0.1)
-            self.pattern_thread = None
+        """Stop the running pattern and wait briefly for the worker to let go of the pin"""
+        if not self._pattern_idle.is_set():
+            self._pattern_stop.set()
+            self._pattern_idle.wait(timeout=0.1)
 
-    def perform_factory_reset(self):
-        """Perform a factory reset of the device using the factory-reset.sh script"""
-        try:
-            print("Performing factory reset...")
+    def _resolve_script(self):
+        """Find factory-reset.sh in the install location, falling back to the bin/ directory of this checkout"""
+        if os.path.exists(FACTORY_RESET_SCRIPT):
+            return FACTORY_RESET_SCRIPT
 
-            # Path to the factory reset script
-            script_path = "/home/pi/freezerbot/bin/factory-reset.sh"
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        script_path = os.path.join(os.path.dirname(script_dir), 'bin', "factory-reset.sh")
+        if os.path.exists(script_path):
+            return script_path
 
-            # Check if script exists and is executable
-            if not os.path.exists(script_path):
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                script_path = os.path.join(os.path.dirname(script_dir), 'bin', "factory-reset.sh")
+        logger.error("Factory reset script not found at %s or %s", FACTORY_RESET_SCRIPT, script_path)
+        return None
 
-                if not os.path.exists(script_path):
-                    print(f"Factory reset script not found at {script_path}")
-                    self.set_state("error")
-                    return
+    def perform_factory_reset(self):
+        """Perform a factory reset of the device using the factory-reset.sh script"""
+        try:
+            logger.info("Performing factory reset...")
 
-            # Make sure the script is executable
-            subprocess.run(["/usr/bin/sudo", "/usr/bin/chmod", "+x", script_path], check=True)
+            script_path = self._factory_reset_script
+            if script_path is None:
+                logger.error("Factory reset script not found")
+                self.set_state("error")
+                return
 
-            # Run the factory reset script with sudo
-            result = subprocess.run(["/usr/bin/sudo", script_path], check=True)
+            # Run the factory reset script with sudo - install.sh marks it executable
+            result = subprocess.run(("/usr/bin/sudo", script_path), check=True)
 
             if result.returncode != 0:
-                print(f"Factory reset script failed with exit code {result.returncode}")
+                logger.error("Factory reset script failed with exit code %s", result.returncode)
                 self.set_state("error")
                 return
 
-            print("Factory reset completed. Rebooting...")
+            logger.info("Factory reset completed. Rebooting...")
             self.reboot_system()
 
-        except Exception as e:
-            print(f"Error during factory reset: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("Error during factory reset")
             self.set_state("error")
 
     def reboot_system(self):
         """Reboot the system"""
         try:
-            subprocess.run(["/usr/bin/sudo", "/usr/sbin/reboot"], check=True)
-        except Exception as e:
-            print(f"Error rebooting system: {traceback.format_exc()}")
+            subprocess.run(REBOOT_COMMAND, check=True)
+        except Exception:
+            logger.exception("Error rebooting system")
 
     def cleanup(self):
         """Clean up resources"""
         self.running = False
+        self._shutdown.set()
+        # Wake the button thread wherever it is waiting so it can see running is False
+        self._press_event.set()
+        self._release_event.set()
 
         if hasattr(self, 'button_thread') and self.button_thread and self.button_thread.is_alive():
             self.button_thread.join(timeout=0.5)
+        if getattr(self, 'button_poll_thread', None) and self.button_poll_thread.is_alive():
+            self.button_poll_thread.join(timeout=0.5)
 
         if self.pwm:
             self.pwm.stop()
@@ -418,6 +582,7 @@ class LedControl:
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     if len(sys.argv) > 1:
         try:
             LedControl().set_state(sys.argv[1])
@@ -1,17 +1,96 @@
+import fcntl
 import json
+import logging
 import os
+import re
+import socket
+import struct
 import subprocess
-import traceback
-from datetime import datetime
+import time
+
+logger = logging.getLogger(__name__)
+
+# Several getters are called back to back every monitoring cycle - they share one nmcli call within this window
+NMCLI_CACHE_SECONDS = 2.0
+_nmcli_cache = {}
+# The wlan0 MAC never changes, so it is looked up once per process
+_mac_address = None
+WLAN0_ADDRESS_FILE = "/sys/class/net/wlan0/address"
+WLAN0_OPERSTATE_FILE = "/sys/class/net/wlan0/operstate"
+SIOCGIFADDR = 0x8915
+# Google's public DNS answers TCP on port 53
+CONNECTIVITY_CHECK_ADDRESS = ("8.8.8.8", 53)
+
+# Shared by every nmcli/ip call: no inherited stdin, and the C locale so output is untranslated
+# (the parsers below match literal "yes"/"inet") and nmcli skips loading locale catalogs
+_RUN_KW = dict(capture_output=True, text=True, timeout=2, stdin=subprocess.DEVNULL, env={**os.environ, 'LC_ALL': 'C'})
+
+# Parsers for nmcli's terse (-t) output and `ip addr`, each applied once to the whole stdout
+_NMCLI_FIELD = re.compile(r'^([^:\n]+):(.*)$', re.M)
+_ACTIVE_WIFI = re.compile(r'^yes:(.*):(\d*)$', re.M)
+_WLAN0_CONNECTION = re.compile(r'^(.+):wlan0$', re.M)
+_IP_ADDR_INET = re.compile(r'\binet (\d+\.\d+\.\d+\.\d+)/')
+_IP_ADDR_ETHER = re.compile(r'\blink/ether ([0-9a-fA-F:]{17})\b')
+
+
+def _cached(key, load):
+    """Return load()'s result, reusing it for NMCLI_CACHE_SECONDS"""
+    now = time.monotonic()
+    entry = _nmcli_cache.get(key)
+    if entry is not None and now - entry[0] < NMCLI_CACHE_SECONDS:
+        return entry[1]
+
+    value = load()
+    _nmcli_cache[key] = (now, value)
+    return value
+
+
+def _wlan0_snapshot() -> dict:
+    """State, MAC and IPv4 address of wlan0 from a single `nmcli device show`, keyed by nmcli field name"""
+    def load():
+        result = subprocess.run(
+            ["/usr/bin/nmcli", "-t", "-f", "GENERAL.STATE,GENERAL.HWADDR,IP4.ADDRESS", "device", "show", "wlan0"],
+            **_RUN_KW
+        )
+        fields = {}
+        if result.returncode == 0:
+            # Terse output escapes the colons inside values, e.g. GENERAL.HWADDR:D8\:3A\:DD...
+            for key, value in _NMCLI_FIELD.findall(result.stdout):
+                fields.setdefault(key, value.replace('\\:', ':'))
+        return fields
+
+    return _cached('wlan0', load)
+
+
+def _active_wifi():
+    """(ssid, signal) of the access point wlan0 is associated with, or (None, None)"""
+    def load():
+        result = subprocess.run(
+            ["/usr/bin/nmcli", "-t", "-f", "ACTIVE,SSID,SIGNAL", "device", "wifi", "list", "--rescan", "no"],
+            **_RUN_KW
+        )
+        match = _ACTIVE_WIFI.search(result.stdout) if result.returncode == 0 else None
+        if match is None:
+            return None, None
+        ssid, signal = match.groups()
+        return ssid.replace('\\:', ':') or None, int(signal) if signal else None
+
+    return _cached('wifi', load)
 
 
 def connected_to_wifi() -> bool:
-    nm_status = subprocess.run(
-        ["/usr/bin/nmcli", "-t", "-f", "DEVICE,STATE", "device", "status"],
-        capture_output=True, text=True
-    ).stdout.strip()
+    try:
+        # The kernel reports "up" once wlan0 is associated - no nmcli process needed
+        with open(WLAN0_OPERSTATE_FILE) as f:
+            return f.read().strip() == 'up'
+    except OSError:
+        pass
 
-    return 'wlan0:connected' in nm_status
+    try:
+        # GENERAL.STATE is e.g. "100 (connected)"
+        return _wlan0_snapshot().get('GENERAL.STATE', '').startswith('100')
+    except Exception:
+        return False
 
 
 def get_wifi_signal_strength() -> int:
@@ -23,24 +102,11 @@ def get_wifi_signal_strength() -> int:
         # First check if connected
         if not connected_to_wifi():
             return -100
-        
-        # Get signal strength using nmcli
-        result = subprocess.run(
-            ["/usr/bin/nmcli", "-t", "-f", "SIGNAL", "device", "wifi", "list", "--rescan", "no"],
-            capture_output=True, text=True, timeout=2
-        )
-        
-        if result.returncode == 0 and result.stdout.strip():
-            # Get the first line (current connection)
-            lines = result.stdout.strip().split('\n')
-            if lines:
-                # Parse signal strength (should be a number 0-100)
-                try:
-                    signal = int(lines[0].strip())
-                    return max(0, min(100, signal)) * -1  # Clamp to 0-100
-                except ValueError:
-                    pass
-        
+
+        _, signal = _active_wifi()
+        if signal is not None:
+            return max(0, min(100, signal)) * -1  # Clamp to 0-100
+
         # Fallback: if connected but can't get signal, return a default value
         return -50
     except Exception as e:
@@ -53,24 +119,46 @@ def test_internet_connectivity() -> bool:
     try:
         if not connected_to_wifi():
             return False
-        # Try pinging common DNS servers with short timeout
-        result = subprocess.run(
-            ["/bin/ping", "-c", "1", "-W", "2", "8.8.8.8"],
-            capture_output=True,
-            timeout=3
-        )
-        return result.returncode == 0
+        # Connecting a UDP socket sends nothing - it only fails fast (ENETUNREACH) when there is no route,
+        # instead of waiting out the TCP timeout below
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect(CONNECTIVITY_CHECK_ADDRESS)
+        # Open (and immediately close) a TCP connection to a public DNS server - no ping process to fork
+        with socket.create_connection(CONNECTIVITY_CHECK_ADDRESS, timeout=2):
+            return True
     except:
         return False
 
 network_status_file = "/home/pi/freezerbot-logs/network_status.json"
+# Same location the Config class uses
+config_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.json')
+_configured_networks_cache = (None, [])
+# In-memory mirror of what is on disk, so loads don't re-parse the file and no-op saves can be skipped
+_network_status = None
+
+
+def _utc_timestamp():
+    """ISO 8601 UTC time to the second, e.g. 2025-01-31T12:00:00Z"""
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+def _without_timestamp(network_status):
+    return {key: value for key, value in network_status.items() if key != 'last_updated'}
+
 
 def load_network_status():
     """Load network failure count and reboot count from persistent storage"""
+    global _network_status
+
     try:
+        if _network_status is not None:
+            # Callers update the dict they get back, so hand out a copy of the mirror
+            return dict(_network_status)
+
         if os.path.exists(network_status_file):
             with open(network_status_file, 'r') as f:
-                return json.load(f)
+                _network_status = json.load(f)
+            return dict(_network_status)
         else:
             # Create directory if it doesn't exist
             os.makedirs(os.path.dirname(network_status_file), exist_ok=True)
@@ -78,14 +166,14 @@ def load_network_status():
             return {
                 'network_failure_count': 0,
                 'reboot_count': 0,
-                'last_updated': datetime.utcnow().isoformat()
+                'last_updated': _utc_timestamp()
             }
     except Exception as e:
-        print(f"Error loading network status: {traceback.format_exc()}")
+        logger.error("Error loading network status: %r", e, exc_info=logger.isEnabledFor(logging.DEBUG))
         return {
             'network_failure_count': 0,
             'reboot_count': 0,
-            'last_updated': datetime.utcnow().isoformat()
+            'last_updated': _utc_timestamp()
         }
 
 def reset_network_status():
@@ -94,23 +182,40 @@ def reset_network_status():
             'network_failure_count': 0,
             'reboot_count': 0,
         })
-    except Exception:
-        print(f'Failure resetting network status file: {traceback.format_exc()}')
+    except Exception as e:
+        logger.error("Failure resetting network status file: %r", e, exc_info=logger.isEnabledFor(logging.DEBUG))
 
 def save_network_status(network_status):
     """Save network failure count and reboot count to persistent storage"""
+    global _network_status
+
     try:
+        # Only the timestamp would change - keep the existing file
+        if _network_status is not None and _without_timestamp(network_status) == _without_timestamp(_network_status):
+            return True
+
         # Update the last_updated timestamp
-        network_status['last_updated'] = datetime.utcnow().isoformat()
+        network_status['last_updated'] = _utc_timestamp()
 
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(network_status_file), exist_ok=True)
 
-        with open(network_status_file, 'w') as f:
-            json.dump(network_status, f, indent=2)
+        # Write a temp file and rename it over the old one, so a crash or power cut never leaves a half-written file
+        # Serialize up front so the file is written with a single write() call
+        data = json.dumps(network_status, separators=(',', ':')).encode()
+        temp_file = network_status_file + '.tmp'
+        fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(temp_file, network_status_file)
+
+        _network_status = dict(network_status)
         return True
     except Exception as e:
-        print(f"Error saving network status: {traceback.format_exc()}")
+        logger.error("Error saving network status: %r", e, exc_info=logger.isEnabledFor(logging.DEBUG))
         return False
 
 
@@ -120,36 +225,19 @@ def get_current_wifi_ssid() -> str:
     Returns None if not connected or unable to retrieve SSID.
     """
     try:
-        # Try to get SSID from active connection
+        # The active access point is shared with get_wifi_signal_strength()
+        ssid, _ = _active_wifi()
+        if ssid:
+            return ssid
+
+        # Fallback: the name of the active connection on wlan0
         result = subprocess.run(
             ["/usr/bin/nmcli", "-t", "-f", "NAME,DEVICE", "connection", "show", "--active"],
-            capture_output=True, text=True, timeout=2
-        )
-        
-        if result.returncode == 0 and result.stdout.strip():
-            # Look for wlan0 connection
-            for line in result.stdout.strip().split('\n'):
-                if ':wlan0' in line:
-                    ssid = line.split(':')[0]
-                    return ssid
-        
-        # Fallback: try getting SSID from wifi list
-        result = subprocess.run(
-            ["/usr/bin/nmcli", "-t", "-f", "SSID,SIGNAL", "device", "wifi", "list", "--rescan", "no"],
-            capture_output=True, text=True, timeout=2
+            **_RUN_KW
         )
-        
-        if result.returncode == 0 and result.stdout.strip():
-            # Get the first line (current connection should have highest signal)
-            lines = result.stdout.strip().split('\n')
-            if lines:
-                parts = lines[0].split(':')
-                if len(parts) >= 1:
-                    ssid = parts[0].strip()
-                    if ssid:
-                        return ssid
-        
-        return None
+
+        match = _WLAN0_CONNECTION.search(result.stdout) if result.returncode == 0 else None
+        return match.group(1) if match else None
     except Exception as e:
         return None
 
@@ -160,36 +248,29 @@ def get_ip_address() -> str:
     Returns None if not available or unable to retrieve.
     """
     try:
-        # Try using nmcli first
-        result = subprocess.run(
-            ["/usr/bin/nmcli", "-t", "-f", "IP4.ADDRESS", "device", "show", "wlan0"],
-            capture_output=True, text=True, timeout=2
-        )
+        # Ask the kernel directly - no subprocess needed
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            ifreq = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, struct.pack('256s', b'wlan0'))
+        return socket.inet_ntoa(ifreq[20:24])
+    except OSError:
+        # wlan0 is missing or has no IPv4 address yet
+        pass
 
-        if result.returncode == 0 and result.stdout.strip():
-            ip_line = result.stdout.strip().split('\n')[0]
-            if ip_line:
-                # Format is usually "IP4.ADDRESS[1]:192.168.1.1/24" - extract just the IP
-                ip = ip_line.split(':')[1].split('/')[0].strip()
-                if ip:
-                    return ip
+    try:
+        # Format is "IP4.ADDRESS[1]:192.168.1.1/24" - extract just the IP
+        ip = _wlan0_snapshot().get('IP4.ADDRESS[1]', '').partition('/')[0].strip()
+        if ip:
+            return ip
 
         # Fallback: use ip addr command
         result = subprocess.run(
             ["/bin/ip", "addr", "show", "wlan0"],
-            capture_output=True, text=True, timeout=2
+            **_RUN_KW
         )
 
-        if result.returncode == 0 and result.stdout.strip():
-            for line in result.stdout.strip().split('\n'):
-                if 'inet ' in line and not 'inet6' in line:
-                    # Extract IP address (format: inet 192.168.1.1/24 ...)
-                    parts = line.strip().split()
-                    if len(parts) >= 2:
-                        ip = parts[1].split('/')[0]
-                        return ip
-
-        return None
+        # Format: inet 192.168.1.1/24 ...
+        match = _IP_ADDR_INET.search(result.stdout) if result.returncode == 0 else None
+        return match.group(1) if match else None
     except Exception as e:
         return None
 
@@ -199,34 +280,38 @@ def get_mac_address() -> str:
     Get the MAC address of wlan0 interface.
     Returns None if not available or unable to retrieve.
     """
+    global _mac_address
+
+    if _mac_address is None:
+        mac = _read_mac_address()
+        # nmcli reports upper case, sysfs and ip lower case - always report it the same way
+        _mac_address = mac.lower() if mac else None
+    return _mac_address
+
+
+def _read_mac_address() -> str:
     try:
-        # Try using nmcli first
-        result = subprocess.run(
-            ["/usr/bin/nmcli", "-t", "-f", "GENERAL.HWADDR", "device", "show", "wlan0"],
-            capture_output=True, text=True, timeout=2
-        )
+        with open(WLAN0_ADDRESS_FILE) as f:
+            mac = f.read().strip()
+        if mac:
+            return mac
+    except OSError:
+        pass
+
+    try:
+        mac = _wlan0_snapshot().get('GENERAL.HWADDR')
+        if mac:
+            return mac
 
-        if result.returncode == 0 and result.stdout.strip():
-            mac = result.stdout.strip().split('GENERAL.HWADDR:')[0]
-            if mac:
-                return mac
-        
         # Fallback: use ip addr command
         result = subprocess.run(
             ["/bin/ip", "addr", "show", "wlan0"],
-            capture_output=True, text=True, timeout=2
+            **_RUN_KW
         )
-        
-        if result.returncode == 0 and result.stdout.strip():
-            for line in result.stdout.strip().split('\n'):
-                if 'link/ether' in line:
-                    # Extract MAC address (format: link/ether aa:bb:cc:dd:ee:ff ...)
-                    parts = line.strip().split()
-                    for part in parts:
-                        if ':' in part and len(part) == 17:  # MAC address format
-                            return part
-        
-        return None
+
+        # Format: link/ether aa:bb:cc:dd:ee:ff ...
+        match = _IP_ADDR_ETHER.search(result.stdout) if result.returncode == 0 else None
+        return match.group(1) if match else None
     except Exception as e:
         return None
 
@@ -237,25 +322,21 @@ def get_configured_wifi_networks() -> list:
     Returns an empty list if config doesn't exist or has no networks.
     Does not include passwords for security.
     """
+    global _configured_networks_cache
+
+    try:
+        mtime = os.stat(config_file).st_mtime_ns
+    except OSError:
+        return []
+
     try:
-        # Get the base directory (same logic as Config class)
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        config_file = os.path.join(base_dir, 'config.json')
-        
-        if not os.path.exists(config_file):
-            return []
-        
-        with open(config_file, 'r') as f:
-            config = json.load(f)
-        
-        networks = config.get('networks', [])
-        ssids = []
-        
-        for network in networks:
-            ssid = network.get('ssid')
-            if ssid:
-                ssids.append(ssid)
-        
-        return ssids
+        # Only re-parse config.json after it has been rewritten
+        cached_mtime, ssids = _configured_networks_cache
+        if mtime != cached_mtime:
+            with open(config_file, 'r') as f:
+                config = json.load(f)
+            ssids = [network['ssid'] for network in config.get('networks', []) if network.get('ssid')]
+            _configured_networks_cache = (mtime, ssids)
+        return list(ssids)
     except Exception as e:
-        return []
\ No newline at end of file
+        return []
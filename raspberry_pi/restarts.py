@@ -7,13 +7,12 @@ def restart_in_setup_mode():
     time.sleep(2)
     subprocess.run(["/usr/bin/systemctl", "enable", "freezerbot-setup.service"])
     subprocess.run(["/usr/bin/systemctl", "restart", "freezerbot-setup.service"])
-    subprocess.run(["/usr/bin/systemctl", "disable", "freezerbot-monitor.service"])
-    subprocess.run(["/usr/bin/systemctl", "stop", "freezerbot-monitor.service"])
+    # Last, since this usually runs inside the monitor service and stops it
+    subprocess.run(["/usr/bin/systemctl", "disable", "--now", "freezerbot-monitor.service"])
 
 
 def restart_in_sensor_mode():
-    subprocess.run(["/usr/bin/systemctl", "stop", "hostapd.service"])
-    subprocess.run(["/usr/bin/systemctl", "stop", "dnsmasq.service"])
+    subprocess.run(["/usr/bin/systemctl", "stop", "hostapd.service", "dnsmasq.service"])
 
     # Re-enable NetworkManager control of wlan0
     subprocess.run(["/usr/bin/nmcli", "device", "set", "wlan0", "managed", "yes"])
@@ -24,5 +23,5 @@ def restart_in_sensor_mode():
 
     subprocess.run(["/usr/bin/systemctl", "enable", "freezerbot-monitor.service"])
     subprocess.run(["/usr/bin/systemctl", "restart", "freezerbot-monitor.service"])
-    subprocess.run(["/usr/bin/systemctl", "disable", "freezerbot-setup.service"])
-    subprocess.run(["/usr/bin/systemctl", "stop", "freezerbot-setup.service"])
\ No newline at end of file
+    # Last, since this usually runs inside the setup service and stops it
+    subprocess.run(["/usr/bin/systemctl", "disable", "--now", "freezerbot-setup.service"])
\ No newline at end of file
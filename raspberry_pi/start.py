@@ -15,22 +15,20 @@ def determine_mode():
     # and the services are already running
     if config.is_configured:
         print('Configuration valid, starting freezerbot-monitor.service')
-        subprocess.run(["sudo", "systemctl", "disable", "freezerbot-setup.service"])
-        subprocess.run(["sudo", "systemctl", "stop", "freezerbot-setup.service"])
-        subprocess.run(["sudo", "systemctl", "enable", "freezerbot-monitor.service"])
-        subprocess.run(["sudo", "systemctl", "restart", "freezerbot-monitor.service"])
+        subprocess.run(["/usr/bin/sudo", "/usr/bin/systemctl", "disable", "--now", "freezerbot-setup.service"])
+        subprocess.run(["/usr/bin/sudo", "/usr/bin/systemctl", "enable", "freezerbot-monitor.service"])
+        subprocess.run(["/usr/bin/sudo", "/usr/bin/systemctl", "restart", "freezerbot-monitor.service"])
     else:
         print('Configuration invalid, starting freezerbot-setup.service')
-        subprocess.run(["sudo", "systemctl", "disable", "freezerbot-monitor.service"])
-        subprocess.run(["sudo", "systemctl", "stop", "freezerbot-monitor.service"])
-        subprocess.run(["sudo", "systemctl", "enable", "freezerbot-setup.service"])
-        subprocess.run(["sudo", "systemctl", "restart", "freezerbot-setup.service"])
+        subprocess.run(["/usr/bin/sudo", "/usr/bin/systemctl", "disable", "--now", "freezerbot-monitor.service"])
+        subprocess.run(["/usr/bin/sudo", "/usr/bin/systemctl", "enable", "freezerbot-setup.service"])
+        subprocess.run(["/usr/bin/sudo", "/usr/bin/systemctl", "restart", "freezerbot-setup.service"])
 
 
 def ensure_updater_is_active():
     """Make sure the firmware updater service and timer are enabled"""
-    subprocess.run(["sudo", "systemctl", "enable", "freezerbot-updater.timer"])
-    subprocess.run(["sudo", "systemctl", "restart", "freezerbot-updater.timer"])
+    subprocess.run(["/usr/bin/sudo", "/usr/bin/systemctl", "enable", "freezerbot-updater.timer"])
+    subprocess.run(["/usr/bin/sudo", "/usr/bin/systemctl", "restart", "freezerbot-updater.timer"])
 
 
 if __name__ == "__main__":
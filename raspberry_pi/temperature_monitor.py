@@ -1,15 +1,17 @@
+import logging
+import os
 import time
 import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 import RPi.GPIO as GPIO
 import subprocess
 from led_control import LedControl
-from w1thermsensor import W1ThermSensor
-from datetime import datetime
-from gpiozero import CPUTemperature
+from dotenv import load_dotenv
 
-from api import make_api_request, api_token_exists, set_api_token, make_api_request_with_creds
-from freezerbot_setup import FreezerBotSetup
+from api import make_api_request, api_token_exists, set_api_token, make_api_request_with_creds, close_session, \
+    is_connection_error
 from config import Config
 from battery import PiSugarMonitor
 from network import test_internet_connectivity, load_network_status, save_network_status, reset_network_status, \
@@ -17,27 +19,79 @@ from network import test_internet_connectivity, load_network_status, save_networ
 from device_info import DeviceInfo
 from restarts import restart_in_setup_mode
 
+ADAPTIVE_REPORTING_ENABLED = 'ADAPTIVE_REPORTING_ENABLED'
+# With adaptive reporting, a reading within this many degrees of the last one sent is not posted...
+UNCHANGED_READING_DELTA_C = 0.2
+# ...unless this long has passed since the last reading was sent
+READING_HEARTBEAT_SECONDS = 600
+# Send queued errors inside the reading POST instead of a separate sensors/errors request (needs API support)
+INLINE_ERROR_REPORTING_ENABLED = 'INLINE_ERROR_REPORTING_ENABLED'
+# Readings that couldn't be sent are kept in memory - a day's worth at one reading a minute
+MAX_QUEUED_READINGS = 1440
+# How many queued readings are sent after each successful reading, so catching up doesn't stall the loop
+QUEUED_READINGS_PER_CYCLE = 30
+# Readings are started this far apart, however long taking and sending each one takes
+READING_INTERVAL_SECONDS = 60
+# Recovery commands (module reloads, NetworkManager restarts) that hang longer than this are killed,
+# so a stuck command can't stop the monitoring loop
+RECOVERY_COMMAND_TIMEOUT_SECONDS = 60
+# A sensor read (~750ms) that hasn't finished after this long counts as a sensor error - reads that reset the
+# 1-Wire modules first also get RECOVERY_COMMAND_TIMEOUT_SECONDS
+SENSOR_READ_TIMEOUT_SECONDS = 10
+# During an outage the failure count is written to disk every this many failures (plus at the recovery thresholds)
+NETWORK_STATUS_SAVE_INTERVAL = 5
+# Errors waiting to be reported are kept in memory - the oldest are dropped during a long outage...
+MAX_CONSECUTIVE_ERRORS = 50
+# ...and each one is trimmed to its last characters (the end of a traceback) when sent
+MAX_ERROR_LENGTH = 2048
+# Report errors in batches - when this many are queued or this long after the last report - instead of every cycle
+BATCHED_ERROR_REPORTING_ENABLED = 'BATCHED_ERROR_REPORTING_ENABLED'
+ERROR_REPORT_BATCH_SIZE = 10
+ERROR_REPORT_INTERVAL_SECONDS = 600
+
+
+def _utc_iso_now():
+    """Current UTC time for the API, e.g. 2025-01-31T12:00:00Z"""
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
 
 class TemperatureMonitor:
     def __init__(self):
         """Initialize the temperature monitoring application"""
         self.config = Config()
-        self.consecutive_errors = []
+        # Before any hardware is set up - without a config the monitor goes straight back to setup mode
+        self.validate_config()
+
+        self.consecutive_errors = deque(maxlen=MAX_CONSECUTIVE_ERRORS)
 
         self.led_control = LedControl()
-        self.freezerbot_setup = FreezerBotSetup()
         self.pisugar = PiSugarMonitor()
         self.device_info = DeviceInfo()
         self.network_status = load_network_status()
         self.network_failure_count = self.network_status.get('network_failure_count', 0)
         self.reboot_count = self.network_status.get('reboot_count', 0)
         self.max_reboots = 3
+        # Whether the current outage has already queued its "Excessive network failures" error
+        self.excessive_failures_reported = False
         self.sensor = None
+        self.cpu_temperature = None
+        # One worker, so sensor reads (and the 1-Wire recovery they may trigger) never overlap each other
+        self.sensor_executor = ThreadPoolExecutor(max_workers=1)
+        # The last read submitted to the worker - kept so a hung read isn't queued behind
+        self.temperature_future = None
+        self.queued_readings = deque(maxlen=MAX_QUEUED_READINGS)
         self.consecutive_sensor_errors = 0
         self.max_sensor_errors_before_modprobe = 3
         self.max_sensor_errors_before_reboot = 10
 
-        self.validate_config()
+        load_dotenv(override=True)
+        self.adaptive_reporting = os.getenv(ADAPTIVE_REPORTING_ENABLED, 'false').lower() == 'true'
+        self.inline_error_reporting = os.getenv(INLINE_ERROR_REPORTING_ENABLED, 'false').lower() == 'true'
+        self.last_sent_temperature = None
+        self.last_sent_time = None
+        self.has_api_token = False
+        self.batched_error_reporting = os.getenv(BATCHED_ERROR_REPORTING_ENABLED, 'false').lower() == 'true'
+        self.last_error_report_time = time.monotonic()
 
     def validate_config(self):
         """Check for a valid config file"""
@@ -51,6 +105,10 @@ class TemperatureMonitor:
             exit(0)
 
     def obtain_api_token(self):
+        # Once a token is known to be in .env, don't re-read the file every cycle
+        if self.has_api_token:
+            return
+
         if not api_token_exists():
             response = make_api_request_with_creds(
                 {
@@ -60,7 +118,7 @@ class TemperatureMonitor:
                 'sensors/configure',
                 json={**self.device_info.device_info, **{
                     'name': self.config.config['device_name'],
-                    'configured_at': datetime.utcnow().isoformat() + 'Z'
+                    'configured_at': _utc_iso_now()
                 }}
             )
 
@@ -76,6 +134,7 @@ class TemperatureMonitor:
                 data = response.json()
                 if 'token' in data:
                     set_api_token(data['token'])
+                    self.has_api_token = True
                     self.config.clear_creds_from_config()
                 else:
                     print(f'No token in response: {data}')
@@ -83,39 +142,67 @@ class TemperatureMonitor:
 
         else:
             print('Api already token exists')
+            self.has_api_token = True
+
+    def read_temperature(self, reset_modules=False):
+        """Read the sensor on the worker thread, re-creating it first if the last read failed
 
-    def read_temperature(self):
-        """Read temperature with escalating recovery methods"""
+        Only returns the temperature or raises - error counting and reboots are left to wait_for_temperature
+        on the main thread"""
         print('Reading temperature')
 
         if self.sensor is None:
-            try:
-                if self.consecutive_sensor_errors >= self.max_sensor_errors_before_modprobe:
-                    print(f"Resetting 1-Wire modules after {self.consecutive_sensor_errors} failures")
-                    subprocess.run(["/usr/sbin/modprobe", "-r", "w1_gpio", "w1_therm"])
-                    time.sleep(1)
-                    subprocess.run(["/usr/sbin/modprobe", "w1_gpio", "w1_therm"])
-                    time.sleep(2)  # Give system time to detect sensors
-                self.sensor = W1ThermSensor()
-            except Exception as e:
-                self.consecutive_sensor_errors += 1
-                self.consecutive_errors.append(f'Error creating sensor instance: {traceback.format_exc()}')
-                self._check_for_reboot_condition('sensor')
-                raise
-
-        if self.sensor is not None:
-            try:
-                temperature = self.sensor.get_temperature()
-                self.consecutive_sensor_errors = 0
-                return temperature
-            except Exception as e:
-                self.consecutive_sensor_errors += 1
-                self.consecutive_errors.append(f"Error reading from existing sensor: {traceback.format_exc()}")
-                self._check_for_reboot_condition('sensor')
-                raise
+            if reset_modules:
+                # modprobe -r returns once the modules are unloaded, so they can be loaded straight back.
+                # -a is needed to load both - otherwise modprobe takes w1_therm as a parameter to w1_gpio
+                subprocess.run(["/bin/sh", "-c", "/usr/sbin/modprobe -r w1_therm w1_gpio; /usr/sbin/modprobe -a w1_gpio w1_therm"],
+                               timeout=RECOVERY_COMMAND_TIMEOUT_SECONDS)
+                time.sleep(2)  # Give system time to detect sensors
+            # Imported here so the firmware updater, which imports this module, doesn't pay for it
+            from w1thermsensor import W1ThermSensor
+            self.sensor = W1ThermSensor()
+
+        return self.sensor.get_temperature()
+
+    def start_temperature_read(self):
+        """Start reading the sensor in the background, returning (future, timeout to wait for it with)"""
+        if self.temperature_future is not None and not self.temperature_future.done():
+            # The only worker is still stuck in an earlier read - a new one would just queue behind it
+            return None, SENSOR_READ_TIMEOUT_SECONDS
+
+        reset_modules = self.sensor is None and self.consecutive_sensor_errors >= self.max_sensor_errors_before_modprobe
+        if reset_modules:
+            print(f"Resetting 1-Wire modules after {self.consecutive_sensor_errors} failures")
+        self.temperature_future = self.sensor_executor.submit(self.read_temperature, reset_modules)
+        if reset_modules:
+            return self.temperature_future, SENSOR_READ_TIMEOUT_SECONDS + RECOVERY_COMMAND_TIMEOUT_SECONDS
+        return self.temperature_future, SENSOR_READ_TIMEOUT_SECONDS
+
+    def wait_for_temperature(self, temperature_future, timeout):
+        """Wait for the background read, counting failures (a timeout included) and escalating to a reboot"""
+        try:
+            if temperature_future is None:
+                raise FutureTimeoutError()
+            temperature = temperature_future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self.consecutive_sensor_errors += 1
+            self.consecutive_errors.append(f"Sensor read timed out after {timeout}s")
+            # Whatever the hung read was using can't be trusted - re-probe the bus once the worker is free
+            self.sensor = None
+            self._check_for_reboot_condition('sensor')
+            raise Exception(f"Sensor read timed out after {timeout}s")
+        except Exception:
+            self.consecutive_sensor_errors += 1
+            # The traceback shows whether creating the sensor instance or reading from it failed
+            self.consecutive_errors.append(f"Error reading temperature: {traceback.format_exc()}")
+            # Drop the instance so the next read re-probes the bus (resetting the 1-Wire modules once
+            # failures reach max_sensor_errors_before_modprobe)
+            self.sensor = None
+            self._check_for_reboot_condition('sensor')
+            raise
 
-        # not sure how this can happen but just in case
-        raise Exception("Unknown error getting temperature")
+        self.consecutive_sensor_errors = 0
+        return temperature
 
     def _check_for_reboot_condition(self, failure_type):
         """Check if we need to reboot the system based on consecutive error count"""
@@ -133,6 +220,8 @@ class TemperatureMonitor:
 
         print(f"Starting with network_failure_count: {self.network_failure_count}, reboot_count: {self.reboot_count}")
 
+        next_reading_time = time.monotonic()
+
         # Main monitoring loop - continue indefinitely
         while True:
             try:
@@ -143,17 +232,26 @@ class TemperatureMonitor:
                     self.led_control.set_state("wifi_issue")
                     self.network_failure_count += 1
 
-                    # Save updated failure count immediately
+                    # Persist the count at the recovery thresholds and periodically in between, not on every
+                    # failed cycle - a reboot saves it too, so at most a few failures are lost on a power cut
                     self.network_status['network_failure_count'] = self.network_failure_count
-                    save_network_status(self.network_status)
+                    if self.network_failure_count in (1, 3, 10) or self.network_failure_count % NETWORK_STATUS_SAVE_INTERVAL == 0:
+                        save_network_status(self.network_status)
 
                     print(f"Network failure #{self.network_failure_count}, reboot_count: {self.reboot_count}")
 
                     # Network recovery logic with escalating actions
                     if self.network_failure_count >= 3 and not recovery_attempted:
                         print("Attempting network recovery by restarting NetworkManager")
-                        subprocess.run(["/usr/bin/systemctl", "restart", "NetworkManager.service"])
+                        # Set first so a restart that hangs isn't attempted again on every offline cycle
                         recovery_attempted = True
+                        try:
+                            subprocess.run(["/usr/bin/systemctl", "restart", "NetworkManager.service"],
+                                           timeout=RECOVERY_COMMAND_TIMEOUT_SECONDS)
+                        except subprocess.TimeoutExpired:
+                            print(f"NetworkManager restart timed out after {RECOVERY_COMMAND_TIMEOUT_SECONDS}s")
+                            self.consecutive_errors.append(
+                                f"NetworkManager restart timed out after {RECOVERY_COMMAND_TIMEOUT_SECONDS}s")
                     elif self.network_failure_count >= 10 and self.reboot_count < self.max_reboots:
                         print(
                             f"Critical network failure (failure: {self.network_failure_count}, reboots: {self.reboot_count}), performing system reboot")
@@ -162,11 +260,17 @@ class TemperatureMonitor:
                         print(
                             f"Excessive network failures ({self.network_failure_count}) after {self.reboot_count} reboots. Continuing to monitor without further reboots.")
                         # Add to consecutive errors but don't reboot
-                        if len(self.consecutive_errors) == 0 or "Excessive network failures" not in \
-                                self.consecutive_errors[-1]:
+                        if not self.excessive_failures_reported:
+                            self.excessive_failures_reported = True
                             self.consecutive_errors.append(
                                 f"Excessive network failures ({self.network_failure_count}) after {self.reboot_count} reboots. Continuing without further reboots.")
 
+                    # Keep taking readings while offline so they can be sent once the connection is back
+                    try:
+                        self.queue_reading(self.collect_reading()[1])
+                    except Exception:
+                        print(f"Error taking reading while offline: {traceback.format_exc()}")
+
                     continue
 
                 # Reset network failure counter if we have internet
@@ -175,6 +279,7 @@ class TemperatureMonitor:
                         f"Network connectivity restored after {self.network_failure_count} failures and {self.reboot_count} reboots")
                     self.network_failure_count = 0
                     self.reboot_count = 0
+                    self.excessive_failures_reported = False
                     reset_network_status()
 
                 recovery_attempted = False
@@ -182,38 +287,48 @@ class TemperatureMonitor:
                 try:
                     self.obtain_api_token()
 
-                    temperature = self.read_temperature()
-
-                    payload = {
-                        "degrees_c": temperature,
-                        "cpu_degrees_c": CPUTemperature().temperature,
-                        "taken_at": datetime.utcnow().isoformat() + 'Z',
-                        'battery_level': self.pisugar.get_battery_level(),
-                        'battery_amps': self.pisugar.get_current(),
-                        'battery_volts': self.pisugar.get_voltage(),
-                        'is_charging': self.pisugar.is_charging(),
-                        'is_plugged_in': self.pisugar.is_power_plugged(),
-                        'is_allowed_to_charge': self.pisugar.is_charging_allowed(),
-                        'wifi_ssid': get_current_wifi_ssid(),
-                        'wifi_signal_strength': get_wifi_signal_strength(),
-                        'ip_address': get_ip_address(),
-                        'mac_address': get_mac_address(),
-                        'configured_wifi_networks': get_configured_wifi_networks(),
-                    }
-
-                    response = make_api_request('sensors/readings', json=payload)
+                    temperature, payload = self.collect_reading()
+
+                    if self.reading_unchanged(temperature):
+                        print('Temperature unchanged since the last reading sent, skipping')
+                        continue
+
+                    if self.inline_error_reporting and self.consecutive_errors:
+                        payload['errors'] = self.pending_errors()
+
+                    try:
+                        response = make_api_request('sensors/readings', json=payload)
+                    except Exception as e:
+                        # Keep the reading for later only if it never reached the API - after a read timeout
+                        # it may already be stored, and sending it again would duplicate it
+                        if is_connection_error(e):
+                            self.queue_reading(payload)
+                        raise
 
                     if response.status_code == 201:
                         print('Successfully sent reading')
+                        self.last_sent_temperature = temperature
+                        self.last_sent_time = time.monotonic()
                         self.led_control.signal_successful_transmission()
                         self.led_control.set_state('running')
+                        if 'errors' in payload:
+                            # Already delivered with the reading - keep only errors queued since
+                            for _ in payload['errors']:
+                                self.consecutive_errors.popleft()
                         self.report_consecutive_errors()
                         api_failure_count = 0
                         response_json = response.json()
                         possible_name = response_json.get('name')
                         if possible_name and self.config.config['device_name'] != possible_name:
                             self.config.save_device_name(possible_name)
+                        self.send_queued_readings()
                     else:
+                        if response.status_code == 503:
+                            # Unavailable, so the reading wasn't stored - other 5xx can come after it was
+                            self.queue_reading(payload)
+                        elif response.status_code == 401:
+                            # Check .env for the token again next cycle
+                            self.has_api_token = False
                         api_failure_count += 1
                         self.consecutive_errors.append(f'API error: {response.status_code} - {response.text}')
 
@@ -243,43 +358,149 @@ class TemperatureMonitor:
                     print(f'Error when sending logs: {traceback.format_exc()}')
 
             finally:
-                time.sleep(60)
+                next_reading_time += READING_INTERVAL_SECONDS
+                now = time.monotonic()
+                if next_reading_time < now:
+                    # A slow cycle overran the interval - start the next one now rather than catching up in a burst
+                    next_reading_time = now
+                time.sleep(next_reading_time - now)
+
+    def collect_reading(self):
+        """Read the sensor and the device status, returning (temperature, reading payload)"""
+        if self.cpu_temperature is None:
+            # Only the monitoring loop needs gpiozero - keep it out of the updater's imports of this module
+            from gpiozero import CPUTemperature
+            self.cpu_temperature = CPUTemperature()
+
+        taken_at = _utc_iso_now()
+        # The DS18B20 takes ~750ms to convert - read it in the background while the rest is collected
+        temperature_future, temperature_timeout = self.start_temperature_read()
+        battery = self.pisugar.get_status()
+        status = {
+            "cpu_degrees_c": self.cpu_temperature.temperature,
+            'battery_level': battery.battery_level,
+            'battery_amps': battery.current,
+            'battery_volts': battery.voltage,
+            'is_charging': battery.charging,
+            'is_plugged_in': battery.power_plugged,
+            'is_allowed_to_charge': battery.charging_allowed,
+            'wifi_ssid': get_current_wifi_ssid(),
+            'wifi_signal_strength': get_wifi_signal_strength(),
+            'ip_address': get_ip_address(),
+            'mac_address': get_mac_address(),
+            'configured_wifi_networks': get_configured_wifi_networks(),
+        }
+        temperature = self.wait_for_temperature(temperature_future, temperature_timeout)
+
+        return temperature, {
+            "degrees_c": temperature,
+            "taken_at": taken_at,
+            **status,
+        }
+
+    def queue_reading(self, payload):
+        """Hold on to a reading that couldn't be sent - the oldest are dropped once the queue is full"""
+        # Errors sent inline are still in consecutive_errors, so they'd be reported twice
+        payload = {key: value for key, value in payload.items() if key != 'errors'}
+        self.queued_readings.append(payload)
+        print(f"Queued reading taken at {payload['taken_at']} ({len(self.queued_readings)} queued)")
+
+    def send_queued_readings(self):
+        """Send queued readings oldest first, stopping at the first one the API doesn't accept"""
+        sent = 0
+        attempts = 0
+        try:
+            # Dropped readings count towards the per-cycle limit too, so a run of rejections can't stall the loop
+            while self.queued_readings and attempts < QUEUED_READINGS_PER_CYCLE:
+                attempts += 1
+                try:
+                    response = make_api_request('sensors/readings', json=self.queued_readings[0])
+                except Exception as e:
+                    if not is_connection_error(e):
+                        # The API may have stored it before the request timed out - don't send it twice
+                        self.queued_readings.popleft()
+                    raise
+                if response.status_code != 201:
+                    if 400 <= response.status_code < 500 and response.status_code not in (401, 429):
+                        # Rejected for good (e.g. a stale taken_at) - sending it again would block the queue
+                        print(f'Dropping queued reading taken at {self.queued_readings[0]["taken_at"]}: '
+                              f'{response.status_code} - {response.text}')
+                        self.queued_readings.popleft()
+                        continue
+                    print(f'Error sending queued reading: {response.status_code} - {response.text}')
+                    if response.status_code >= 500 and response.status_code != 503:
+                        self.queued_readings.popleft()
+                    break
+                self.queued_readings.popleft()
+                sent += 1
+        except Exception:
+            print(f'Error sending queued readings: {traceback.format_exc()}')
+
+        if sent:
+            print(f'Sent {sent} queued readings, {len(self.queued_readings)} still queued')
+
+    def reading_unchanged(self, temperature):
+        """With adaptive reporting enabled, whether this reading can be skipped because it matches the last one sent"""
+        if not self.adaptive_reporting or self.last_sent_temperature is None:
+            return False
+        # Something is waiting to go out with (or after) this reading
+        if self.consecutive_errors or self.queued_readings:
+            return False
+        if time.monotonic() - self.last_sent_time >= READING_HEARTBEAT_SECONDS:
+            return False
+        return abs(temperature - self.last_sent_temperature) < UNCHANGED_READING_DELTA_C
 
     def report_and_reboot_system(self, failure_type: str):
         # Increment reboot count before reboot
         self.reboot_count += 1
         self.network_status['reboot_count'] = self.reboot_count
+        self.network_status['network_failure_count'] = self.network_failure_count
         save_network_status(self.network_status)
 
         # Report critical network failure to API if possible
         try:
             self.consecutive_errors.append(
                 f"Critical {failure_type} failure triggering reboot #{self.reboot_count}. Total network failures: {self.network_failure_count}. Sensor errors: {self.consecutive_sensor_errors}")
-            self.report_consecutive_errors()
+            self.report_consecutive_errors(force=True)
         except Exception:
             print("Failed to report network failure before reboot")
 
         subprocess.run(["/usr/bin/systemctl", "reboot", "-i"])
 
-    def report_consecutive_errors(self):
+    def pending_errors(self):
+        """Queued errors as sent to the API, each trimmed to MAX_ERROR_LENGTH"""
+        return [error[-MAX_ERROR_LENGTH:] for error in self.consecutive_errors]
+
+    def report_consecutive_errors(self, force=False):
         if len(self.consecutive_errors) > 0:
+            if self.batched_error_reporting and not force \
+                    and len(self.consecutive_errors) < ERROR_REPORT_BATCH_SIZE \
+                    and time.monotonic() - self.last_error_report_time < ERROR_REPORT_INTERVAL_SECONDS:
+                return
+
+            self.last_error_report_time = time.monotonic()
             response = make_api_request('sensors/errors', json={
-                'errors': self.consecutive_errors
+                'errors': self.pending_errors()
             })
 
             if response.status_code == 200:
-                self.consecutive_errors = []
+                self.consecutive_errors.clear()
             else:
                 print(f'Error reporting errors: {response.status_code} - {response.text}')
 
     def cleanup(self):
         """Clean up GPIO on exit"""
+        self.pisugar.close()
+        self.sensor_executor.shutdown(wait=False)
+        close_session()
         self.led_control.cleanup()
         GPIO.cleanup()
 
 
 # Main entry point when run directly
 if __name__ == "__main__":
+    # Module loggers (e.g. led_control) print plain messages alongside the existing output
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     try:
         monitor = TemperatureMonitor()
         monitor.run()
@@ -4,21 +4,31 @@ Simple test Flask application for the Freezerbot setup interface.
 Run this on your development machine to test the web interface before deploying to Raspberry Pi.
 """
 
+import logging
 import os
 
-from flask import Flask, request, render_template, redirect, jsonify
-from config import Config
+from flask import Flask, Response, request, render_template, redirect, jsonify
+from config import Config, setup_request_error, SETUP_CONFIG_KEYS, MAX_SETUP_REQUEST_BYTES
+
+logger = logging.getLogger(__name__)
+
+# The static and template folders sit next to this script
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_FOLDER = os.path.join(BASE_DIR, 'static')
+TEMPLATE_FOLDER = os.path.join(BASE_DIR, 'templates')
 
 
 class TestFreezerBotSetup:
     """Test implementation of the Freezerbot setup interface"""
 
     def __init__(self):
-
-        # Find the directory where this script is located
-        self.base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+        self.base_dir = BASE_DIR
 
         self.config = Config('test_config.json')
+        # Encoded config served by /api/get-config
+        self.config_json = None
+        # Rendered page served by /
+        self.index_html = None
 
         self.mock_wifi_networks = ["Home-WiFi", "Office-Net", "FreeWiFi", "Cafe-Guest", "Neighbors-5G"]
 
@@ -26,11 +36,16 @@ class TestFreezerBotSetup:
         # For testing, we'll just serve the static files directly
         self.app = Flask(__name__,
                          static_url_path='',
-                         static_folder=os.path.join(self.base_dir, 'static'),
-                         template_folder=os.path.join(self.base_dir, 'templates'))
+                         static_folder=STATIC_FOLDER,
+                         template_folder=TEMPLATE_FOLDER)
+        # Same request size limit as the real setup server
+        self.app.config['MAX_CONTENT_LENGTH'] = MAX_SETUP_REQUEST_BYTES
+
+        # The mock scan result never changes, so it is encoded once
+        self.scan_wifi_json = self.app.json.dumps({"networks": self.mock_wifi_networks})
 
         # Debug output to help troubleshoot template location
-        print(f"Template folder: {self.app.template_folder}")
+        logger.debug("Template folder: %s", self.app.template_folder)
 
         # Set up the Flask routes
         self.setup_routes()
@@ -52,59 +67,47 @@ class TestFreezerBotSetup:
 
     def index(self):
         """Serve the main Vue application"""
-        return render_template('index.html')
+        # The page takes no context, so it is rendered once - except in debug mode, where template edits should show up
+        if self.index_html is None or self.app.debug:
+            self.index_html = render_template('index.html')
+        return self.index_html
 
     def get_current_config(self):
-        return jsonify(self.config.config)
+        # The config only changes through save_config, so it is encoded once per save rather than per request
+        if self.config_json is None:
+            self.config_json = self.app.json.dumps(self.config.config)
+        return Response(self.config_json, mimetype='application/json')
 
     def create_account(self):
         return jsonify({'success': True})
 
     def scan_wifi(self):
         """Mock WiFi scanning functionality"""
-        print("[TEST] Scanning for WiFi networks")
-        return jsonify({"networks": self.mock_wifi_networks})
+        logger.debug("[TEST] Scanning for WiFi networks")
+        return Response(self.scan_wifi_json, mimetype='application/json')
 
     def save_config(self):
         """Process and save the configuration to a test file"""
+        # Parse and validate up front - a bad request gets its error directly, without going through the
+        # exception handler below
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"success": False, "error": "Invalid JSON"}), 400
+
+        error = setup_request_error(data)
+        if error:
+            return jsonify({"success": False, "error": error})
+
         try:
-            # Get JSON data
-            data = request.json
-            networks = data.get('networks', [])
-            email = data.get('email')
-            password = data.get('password')
-            device_name = data.get('device_name')
-
-            # Validate inputs
-            if not networks or not any(network.get('ssid') and network.get('password') for network in networks):
-                return jsonify({
-                    "success": False,
-                    "error": "At least one WiFi network with SSID and password is required"
-                })
-
-            if not email:
-                return jsonify({"success": False, "error": "Email is required"})
-
-            if not password:
-                return jsonify({"success": False, "error": "Password is required"})
-
-            if not device_name:
-                return jsonify({'success': False, 'error': 'Sensor name is required'})
-
-
-            # Save configuration to test file
-            config = {
-                "networks": networks,
-                "email": email,
-                "password": password,
-                "device_name": device_name
-            }
+            # Save configuration to test file - validation guarantees every field is present
+            config = {key: data[key] for key in SETUP_CONFIG_KEYS}
 
             self.config.save_new_config(config)
+            self.config_json = None
 
             return jsonify({"success": True})
         except Exception as e:
-            print(f"[TEST] Error saving configuration: {str(e)}")
+            logger.error("[TEST] Error saving configuration: %s", e)
             return jsonify({"success": False, "error": str(e)})
 
     def captive_portal_redirect(self):
@@ -119,12 +122,15 @@ class TestFreezerBotSetup:
         print("Access the web interface at http://localhost:5000")
         print("To test WiFi scanning, visit http://localhost:5000/api/scan-wifi")
         print("Test configuration will be saved to 'test_config.json'")
+        print("Set FLASK_DEBUG=1 for the debugger and auto-reload")
         print("=" * 80)
 
-        self.app.run(host="0.0.0.0", port=5000, debug=True)
+        # Debug mode (debugger middleware and reloader) is opt-in - Flask enables it when FLASK_DEBUG is set
+        self.app.run(host="0.0.0.0", port=5000, threaded=True)
 
 
 # Main entry point when run directly
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     test_app = TestFreezerBotSetup()
     test_app.run()